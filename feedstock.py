@@ -1,11 +1,39 @@
-import re 
-import os
+import itertools
+import numpy as np
 import pandas as pd
 
+_DIGITS = '0123456789'
+
+# Column order of the property arrays used by rollup_composites
+_ROLLUP_PROPERTIES = ('hhv', 'hhv_std', 'moisture', 'moisture_std', 'density', 'quantity')
+# Record layout of FeedstockManager.build_lookup_table, with a flag for combinations that have a feedstock
+_LOOKUP_DTYPE = np.dtype([(prop, 'f8') for prop in _ROLLUP_PROPERTIES] + [('present', '?')])
+
+def _parse_components(name: str) -> list:
+    '''
+    Returns (feedstock name, fraction) pairs for a composite feedstock name. Composite names are underscore-separated
+    components with a percentage, e.g. stdBSG50_rawSRU50 gives [('stdBSG', 0.5), ('rawSRU', 0.5)]. Parts of the name 
+    without a percentage (elementary feedstocks, or suffixes such as _mc) are skipped.
+    '''
+    components = []
+    for token in name.split('_'):
+        feedstock_name = token.rstrip(_DIGITS)
+        percent_str = token[len(feedstock_name):]
+        if percent_str and feedstock_name.isalpha():
+            percent = float(percent_str) / 100
+            if percent == 0.33: 
+                percent = 1/3
+            components.append((feedstock_name, percent))
+    return components
+
 class Feedstock:
     '''
     Creates a feedstock to be utilized by the hydrothermal carbonization model(s). 
     '''
+    # __dict__ is kept so analyses can still attach extra attributes (e.g. Monte Carlo results)
+    __slots__ = ('name', 'hhv', 'hhv_std', 'moisture', 'moisture_std', 'moisture_content_target', 'density', 
+                 'water_added', 'quantity', 'temp', 'time', '_components', '__dict__')
+    
     def __init__(self, name: str, hhv: float = 0.0, hhv_std: float = 0.0,
                  moisture: float = 0.0, moisture_std: float = 0.0, density: float = 0.0,
                 time: int = 1, temp: int = 190):
@@ -50,6 +78,25 @@ class Feedstock:
         self.quantity = 0.0
         self.temp = temp
         self.time = time
+        self._components = None
+
+    @property
+    def components(self) -> list:
+        '''
+        Returns (feedstock name, fraction) pairs for a composite feedstock. The parse is cached
+        and only redone if the name has changed since the last call.
+        '''
+        cache = self._components
+        if cache is None or cache[0] != self.name:
+            cache = self._components = (self.name, _parse_components(self.name))
+        return cache[1]
+
+    def change_name(self, name: str):
+        '''
+        Renames a feedstock, e.g. when deriving a standard feedstock from a raw one. 
+        '''
+        self.name = name
+        self._components = None
         
     def set_hhv(self, hhv: float, hhv_std: float):
         '''
@@ -69,12 +116,8 @@ class Feedstock:
         '''Calculate and set the higher heating value (HHV) for a composite feedstock.'''
         composite_hhv = 0.0
         composite_hhv_std = 0.0
-        feedstocks = re.findall(r'([A-Za-z]+)(\d+)', self.name)
 
-        for feedstock_name, percent_str in feedstocks:
-            percent = float(percent_str) / 100
-            if percent == 0.33: 
-                percent = 1/3
+        for feedstock_name, percent in self.components:
             feedstock = feedstock_manager.get_feedstock(feedstock_name, temp, time)
             composite_hhv += feedstock.hhv * percent
             composite_hhv_std += (feedstock.hhv_std * percent) ** 2
@@ -85,12 +128,8 @@ class Feedstock:
     def compute_density(self, temp: int, time: int, feedstock_manager: object):
         '''Calculate and set the density for a composite feedstock.'''
         composite_density = 0.0
-        feedstocks = re.findall(r'([A-Za-z]+)(\d+)', self.name)
 
-        for feedstock_name, percent_str in feedstocks:
-            percent = float(percent_str) / 100
-            if percent == 0.33: 
-                percent = 1/3
+        for feedstock_name, percent in self.components:
             feedstock = feedstock_manager.get_feedstock(feedstock_name, temp, time)
             composite_density += feedstock.density * percent
 
@@ -100,12 +139,8 @@ class Feedstock:
         '''Calculate and set the moisture content for a composite feedstock.'''
         composite_moisture = 0.0
         composite_mc_std = 0.0
-        feedstocks = re.findall(r'([A-Za-z]+)(\d+)', self.name)
 
-        for feedstock_name, percent_str in feedstocks:
-            percent = float(percent_str) / 100
-            if percent == 0.33: 
-                percent = 1/3
+        for feedstock_name, percent in self.components:
             feedstock = feedstock_manager.get_feedstock(feedstock_name, temp, time)
             composite_moisture += feedstock.moisture * percent
             composite_mc_std += (feedstock.moisture_std * percent) ** 2
@@ -116,17 +151,42 @@ class Feedstock:
     def compute_quantity(self, temp: int, time: int, feedstock_manager: object):
         '''Calculate and set the quantity for a composite feedstock.'''
         composite_quantity = 0.0
-        feedstocks = re.findall(r'([A-Za-z]+)(\d+)', self.name)
 
-        for feedstock_name, percent_str in feedstocks:
-            percent = float(percent_str) / 100
-            if percent == 0.33: 
-                percent = 1/3
+        for feedstock_name, percent in self.components:
             feedstock = feedstock_manager.get_feedstock(feedstock_name, temp, time)
             composite_quantity += feedstock.quantity * percent
 
         self.quantity = composite_quantity
         
+    def compute_all(self, temp: int, time: int, feedstock_manager: object):
+        '''
+        Calculate and set the HHV, density, moisture content, and quantity for a composite feedstock in 
+        a single pass over its components. Equivalent to calling compute_hhv, compute_density, 
+        compute_moisture, and compute_quantity in turn.
+        '''
+        composite_hhv = 0.0
+        composite_hhv_std = 0.0
+        composite_density = 0.0
+        composite_moisture = 0.0
+        composite_mc_std = 0.0
+        composite_quantity = 0.0
+
+        for feedstock_name, percent in self.components:
+            feedstock = feedstock_manager.get_feedstock(feedstock_name, temp, time)
+            composite_hhv += feedstock.hhv * percent
+            composite_hhv_std += (feedstock.hhv_std * percent) ** 2
+            composite_density += feedstock.density * percent
+            composite_moisture += feedstock.moisture * percent
+            composite_mc_std += (feedstock.moisture_std * percent) ** 2
+            composite_quantity += feedstock.quantity * percent
+
+        self.hhv = composite_hhv
+        self.hhv_std = composite_hhv_std ** 0.5
+        self.density = composite_density
+        self.moisture = composite_moisture
+        self.moisture_std = composite_mc_std ** 0.5
+        self.quantity = composite_quantity
+        
     def compute_water_added(self):
         '''Calcuate and set the amount of water needed to reach an ideal moisture content for feedstocks'''
         ideal_mc = self.moisture_content_target
@@ -140,13 +200,12 @@ class Feedstock:
             return self.water_added
     
     def get_wet_hhv(self) -> float:
-        """Calculate and return the wet higher heating value (HHV)"""
-        return self.hhv * (1 - self.moisture / 100)
+        """Calculate and return the wet higher heating value (HHV); moisture is a mass fraction"""
+        return self.hhv * (1 - self.moisture)
 
     def total_energy_content(self) -> float:
-        """Calculate and return the total energy content"""
-        dry_hhv = self.get_dry_hhv()
-        return dry_hhv * self.quantity
+        """Calculate and return the total energy content of the (wet) feedstock quantity"""
+        return self.hhv * (1 - self.moisture) * self.quantity
 
     def total_weight(self) -> float:
         """Calculate and return the total weight with added water"""
@@ -155,7 +214,8 @@ class Feedstock:
     # def get_BW_parameters(self) -> dict:
     #     """Create a dictionary with keys 'name' and 'amount' for float attributes."""
     #     result = []
-    #     for attr, value in self.__dict__.items():
+    #     for attr in self.__slots__:
+    #         value = getattr(self, attr, None)
     #         if isinstance(value, float):
     #             result.append({'name': attr, 'amount': value})
     #     return result
@@ -166,30 +226,71 @@ class Feedstock:
                 f"moisture_target={self.moisture_content_target}, water_added={self.water_added}, quantity={self.quantity}, "
                 f"temp={self.temp}C, time={self.time}hr)")
     
+def rollup_composites(offsets: np.ndarray, component_idx: np.ndarray, fractions: np.ndarray, 
+                      properties: np.ndarray) -> np.ndarray:
+    '''
+    Computes composite feedstock properties for a batch of mixtures at once. Mixtures are encoded 
+    CSR-style: mixture m is made up of entries offsets[m] to offsets[m+1] of component_idx & fractions.
+    
+    Parameters:
+    offsets (np.ndarray): Start of each mixture's entries, with one extra element for the end of the last mixture.
+    component_idx (np.ndarray): Row of properties for each entry.
+    fractions (np.ndarray): Mass fraction of each entry in its mixture.
+    properties (np.ndarray): Component properties, with columns ordered as hhv, hhv_std, moisture, 
+        moisture_std, density, quantity.
+    
+    Returns an array of shape (number of mixtures, 6) with columns in the same order. Standard deviations 
+    are combined in quadrature, as in Feedstock.compute_all. 
+    '''
+    n_mixtures = len(offsets) - 1
+    mixture_idx = np.repeat(np.arange(n_mixtures), np.diff(offsets))
+    weighted = properties[component_idx] * fractions[:, None]
+    
+    results = np.empty((n_mixtures, len(_ROLLUP_PROPERTIES)))
+    for i, prop in enumerate(_ROLLUP_PROPERTIES):
+        if prop.endswith('_std'):
+            results[:, i] = np.bincount(mixture_idx, weights=weighted[:, i] ** 2, minlength=n_mixtures) ** 0.5
+        else:
+            results[:, i] = np.bincount(mixture_idx, weights=weighted[:, i], minlength=n_mixtures)
+    return results
+    
 class FeedstockManager:
     '''
-    Stores all created feedstocks in a list.
+    Stores all created feedstocks in a list, indexed by (name, temp, time) for lookups.
     '''
+    # The index is kept in a slot so that __dict__ only holds the feedstocks list
+    __slots__ = ('_index', '__dict__')
+
     def __init__(self):
         self.feedstocks = []
+        self._index = {}
 
     def add_feedstock(self, feedstock: Feedstock):
         '''Adds a feedstock to Feedstock Manager'''
         self.feedstocks.append(feedstock)
+        # The first feedstock added under a given name & reaction conditions is the one returned by lookups
+        self._index.setdefault((feedstock.name, feedstock.temp, feedstock.time), feedstock)
         
-    def delete_feedstock(self, name: str):
-        '''Deletes a feedstock from Feedstock Manager'''
-        if name in self.feedstocks:
-            del self.feedstocks[name]
-        else:
+    def delete_feedstock(self, name: str, temp: int, time: int):
+        '''Deletes a feedstock from Feedstock Manager, given a valid feedstock name, reaction temp, and reaction time'''
+        key = (name, temp, time)
+        feedstock = self._index.pop(key, None)
+        if feedstock is None:
             raise ValueError(f"Feedstock with name '{name}' not found.")
+        self.feedstocks.remove(feedstock)
+        
+        # Any later feedstock added under the same name & reaction conditions is now the one returned by lookups
+        for other in self.feedstocks:
+            if (other.name, other.temp, other.time) == key:
+                self._index[key] = other
+                break
 
     def get_feedstock(self, name: str, temp: int, time: int) -> Feedstock:
         '''Returns a Feedstock object, given a valid feedstock name, reaction temp, and reaction time'''
-        for feedstock in self.feedstocks:
-            if feedstock.name == name and feedstock.temp == temp and feedstock.time == time:
-                return feedstock
-        raise ValueError(f"Feedstock with name '{name}' not found.")
+        try:
+            return self._index[(name, temp, time)]
+        except KeyError:
+            raise ValueError(f"Feedstock with name '{name}' not found.") from None
     
     def duplicate_feedstock(self, original_name: str, new_name: str, temp: int, time: int):
         '''Duplicates a feedstock based on name & returns the new feedstock'''
@@ -211,6 +312,106 @@ class FeedstockManager:
         self.add_feedstock(new_feedstock)
         return new_feedstock
 
+    def compute_composites(self, composite_feedstocks: list):
+        '''
+        Calculate and set the HHV, density, moisture content, and quantity for a batch of composite 
+        feedstocks, using the component feedstocks stored in this manager at each composite's reaction 
+        conditions. Equivalent to calling compute_all on each composite feedstock.
+        '''
+        component_rows = {}
+        component_feedstocks = []
+        offsets = [0]
+        component_idx = []
+        fractions = []
+        
+        for composite in composite_feedstocks:
+            for feedstock_name, percent in composite.components:
+                key = (feedstock_name, composite.temp, composite.time)
+                if key not in component_rows:
+                    component_rows[key] = len(component_feedstocks)
+                    component_feedstocks.append(self.get_feedstock(*key))
+                component_idx.append(component_rows[key])
+                fractions.append(percent)
+            offsets.append(len(component_idx))
+        
+        properties = np.array(
+            [[getattr(feedstock, prop) for prop in _ROLLUP_PROPERTIES] for feedstock in component_feedstocks], 
+            dtype=float
+        ).reshape(len(component_feedstocks), len(_ROLLUP_PROPERTIES))
+        results = rollup_composites(np.array(offsets), np.array(component_idx, dtype=int), 
+                                    np.array(fractions, dtype=float), properties)
+        
+        for composite, values in zip(composite_feedstocks, results.tolist()):
+            for prop, value in zip(_ROLLUP_PROPERTIES, values):
+                setattr(composite, prop, value)
+
+    def build_lookup_table(self) -> tuple:
+        '''
+        Returns a snapshot of feedstock properties as a structured array of shape (names, temps, times), along with 
+        dicts mapping each feedstock name, reaction temp, and reaction time to its position. Combinations without a 
+        feedstock have present set to False. The table does not track later changes to feedstocks, so rebuild it 
+        after updating feedstock properties (e.g. quantities). 
+        '''
+        name_idx = {}
+        for name, temp, time in self._index:
+            name_idx.setdefault(name, len(name_idx))
+        temp_idx = {temp: i for i, temp in enumerate(sorted({temp for name, temp, time in self._index}))}
+        time_idx = {time: i for i, time in enumerate(sorted({time for name, temp, time in self._index}))}
+        
+        table = np.zeros((len(name_idx), len(temp_idx), len(time_idx)), dtype=_LOOKUP_DTYPE)
+        for (name, temp, time), feedstock in self._index.items():
+            table[name_idx[name], temp_idx[temp], time_idx[time]] = (
+                tuple(getattr(feedstock, prop) for prop in _ROLLUP_PROPERTIES) + (True,)
+            )
+        return table, name_idx, temp_idx, time_idx
+
+    def compose_batch(self, component_fracs: pd.DataFrame, temps: list, times: list, 
+                      lookup_table: tuple = None) -> pd.DataFrame:
+        '''
+        Computes composite feedstock properties for every mixture in component_fracs at every combination of 
+        reaction temperature & residence time, without creating Feedstock objects. 
+        
+        Parameters:
+        component_fracs (pd.DataFrame): One row per mixture & one column per component feedstock name 
+            (e.g. rawBSG, stdSRU, rawDCW), with mass fractions as values. 
+        temps (list): Reaction temperatures in °C.
+        times (list): Residence times in hrs.
+        lookup_table (tuple): Output of build_lookup_table, to reuse across batches. Built from the current 
+            feedstocks if not given. 
+        
+        Returns a DataFrame with one row per mixture & reaction condition, indexed like component_fracs, with 
+        columns temp, time, hhv, hhv_std, moisture, moisture_std, density, and quantity. 
+        '''
+        table, name_idx, temp_idx, time_idx = lookup_table if lookup_table is not None else self.build_lookup_table()
+        fracs = component_fracs.to_numpy(dtype=float)
+        n_conditions = len(temps) * len(times)
+        
+        # Gather component records with shape (components, conditions), in itertools.product(temps, times) order
+        try:
+            records = table[np.ix_([name_idx[name] for name in component_fracs.columns], 
+                                   [temp_idx[temp] for temp in temps], [time_idx[time] for time in times])]
+        except KeyError as err:
+            raise ValueError(f"Feedstock with name or reaction condition {err} not found.") from None
+        records = records.reshape(len(component_fracs.columns), n_conditions)
+        if not records['present'].all():
+            name = component_fracs.columns[np.nonzero(~records['present'])[0][0]]
+            raise ValueError(f"Feedstock with name '{name}' not found.")
+        
+        # Standard deviations are combined in quadrature
+        results = np.empty((len(fracs), n_conditions, len(_ROLLUP_PROPERTIES)))
+        for i, prop in enumerate(_ROLLUP_PROPERTIES):
+            if prop.endswith('_std'):
+                results[:, :, i] = (fracs ** 2 @ records[prop] ** 2) ** 0.5
+            else:
+                results[:, :, i] = fracs @ records[prop]
+        
+        conditions = list(itertools.product(temps, times))
+        batch = pd.DataFrame(results.reshape(-1, len(_ROLLUP_PROPERTIES)), columns=list(_ROLLUP_PROPERTIES), 
+                             index=component_fracs.index.repeat(n_conditions))
+        batch.insert(0, 'temp', np.tile([temp for temp, time in conditions], len(fracs)))
+        batch.insert(1, 'time', np.tile([time for temp, time in conditions], len(fracs)))
+        return batch
+
     def __repr__(self):
         return f"FeedstockManager(feedstocks={self.feedstocks})"    
       
@@ -220,35 +421,29 @@ def create_elementary_feedstocks() -> object:
     Returns initial feedstocks for use
     '''     
     elementary_feedstocks = FeedstockManager()
-    df = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='FeedsProperties', engine='openpyxl')
+    df = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='FeedsProperties', engine='calamine')
     HTC_temp = [190, 220, 250]
     HTC_reaction_time = [1,3]
+    reaction_conditions = list(itertools.product(HTC_temp, HTC_reaction_time))
+    properties = df[['Feed', 'HHV', 'HHV_std', 'moisture', 'moisture_std', 'density']].to_numpy()
     
-    for index, row in df.iterrows():
-        for temp in HTC_temp: 
-            for time in HTC_reaction_time: 
-                name = 'raw' + row['Feed']
-                hhv = row['HHV']
-                hhv_std = row['HHV_std']
-                moisture = row['moisture']
-                moisture_std = row['moisture_std']
-                density = row['density']
-
-                # Create a Feedstock object
-                feedstock = Feedstock(name=name, hhv=hhv, hhv_std=hhv_std, moisture=moisture, 
-                                      moisture_std=moisture_std, density=density)         
-                feedstock.temp = temp
-                feedstock.time = time
-                
-                # Add to elementary_feedstocks 
-                elementary_feedstocks.add_feedstock(feedstock)
-                
-                # Setting up infrastructure for standard feedstocks 
-                if feedstock.name == "rawBSG" or feedstock.name == "rawSRU": 
-                    new_feedstock = elementary_feedstocks.duplicate_feedstock(feedstock.name, "std" + feedstock.name[3:], 
-                                                                              feedstock.temp, feedstock.time)
-                    new_feedstock.temp = temp
-                    new_feedstock.time = time
+    for feed, hhv, hhv_std, moisture, moisture_std, density in properties:
+        name = 'raw' + feed
+        # Setting up infrastructure for standard feedstocks 
+        has_standard = name == "rawBSG" or name == "rawSRU"
+        
+        for temp, time in reaction_conditions: 
+            # Create a Feedstock object
+            feedstock = Feedstock(name=name, hhv=hhv, hhv_std=hhv_std, moisture=moisture, 
+                                  moisture_std=moisture_std, density=density)         
+            feedstock.temp = temp
+            feedstock.time = time
+            
+            # Add to elementary_feedstocks 
+            elementary_feedstocks.add_feedstock(feedstock)
+            
+            if has_standard: 
+                elementary_feedstocks.duplicate_feedstock(name, "std" + name[3:], temp, time)
                     
     return elementary_feedstocks
 
@@ -261,31 +456,30 @@ def create_composite_elementary_feedstocks() -> object:
 
     HTC_temp = [190, 220, 250]
     HTC_reaction_time = [1,3]
+    reaction_conditions = list(itertools.product(HTC_temp, HTC_reaction_time))
 
-    df = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='Yield_HC', engine='openpyxl')
-    for row in [row for index, row in df.drop_duplicates(subset='Feed').iterrows() if '_' in row['Feed']]:
+    df = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='Yield_HC', engine='calamine')
+    hhv_sheet = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='HHV_HC', engine='calamine')
+    for name in [name for name in df['Feed'].drop_duplicates() if '_' in name]:
         
-        for temp in HTC_temp: 
-            for time in HTC_reaction_time:
-                name = row['Feed']
-                
-                # Create a Feedstock object 
-                new_feedstock = Feedstock(name=name)
-                new_feedstock.temp = temp
-                new_feedstock.time = time 
-                
-                # Update values of HHV based on previous values 
-                new_feedstock.compute_hhv(temp, time, elementary_feedstocks)
-                hhv_sheet = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='HHV_HC', engine='openpyxl')
-                filtered_df = hhv_sheet[hhv_sheet.iloc[:, 0] == str(name) ]
-                new_feedstock.hhv = filtered_df[filtered_df['hours'] == int(time)][int(temp)].iloc[0]
-                
-                # Computing remaining parameters
-                new_feedstock.compute_moisture(temp, time, elementary_feedstocks)
-                new_feedstock.compute_density(temp, time, elementary_feedstocks)
-                
-                # Adding Item to Composite Feedstock Manager 
-                composite_feedstocks.add_feedstock(new_feedstock)
+        # Experimental HHVs for this composite, by residence time 
+        filtered_df = hhv_sheet[hhv_sheet.iloc[:, 0] == str(name) ]
+        hhv_by_hours = filtered_df.drop_duplicates(subset='hours').set_index('hours')
+        
+        for temp, time in reaction_conditions:
+            # Create a Feedstock object 
+            new_feedstock = Feedstock(name=name)
+            new_feedstock.temp = temp
+            new_feedstock.time = time 
+            
+            # Computing parameters based on previous values 
+            new_feedstock.compute_all(temp, time, elementary_feedstocks)
+            
+            # Update values of HHV based on experimental data 
+            new_feedstock.hhv = hhv_by_hours.at[int(time), int(temp)]
+            
+            # Adding Item to Composite Feedstock Manager 
+            composite_feedstocks.add_feedstock(new_feedstock)
                 
     return composite_feedstocks          
 
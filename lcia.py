@@ -1,28 +1,52 @@
-import openpyxl
+import math
+import operator
+import numpy as np
 
 class HTCLCIA: 
     '''
     Stores Life Cycle Impact Assessment (LCIA) results for producing hydrochar from food waste
     for different feedstock names & conditions. 
+    
+    Scores are held in a single (impact category x process category) array, with units in a 
+    parallel array of the same shape. 
     '''
+    __slots__ = ('name', 'scores', 'units')
+    
+    _IMPACT_CATEGORIES = (
+        'water_use', 'energy_resources', 'acidification', 'climate_change', 'ecotoxicity_freshwater', 
+        'eutrophication', 'human_toxicity_carcinogenic', 'human_toxicity_noncarcinogenic', 'ozone_depletion', 
+        'particulate_matter_formation', 'photochemical_oxidant_formation'
+    )
+    _PROCESS_CATEGORIES = (
+        'Water', 'Electricity - HTC', 'Heat-HTC', 'CO2 - HTC', 'Wastewater', 'Electricity - Post-Processing', 
+        'Transportation'
+    )
+    _IMPACT_IDX = {category: i for i, category in enumerate(_IMPACT_CATEGORIES)}
+    _PROCESS_IDX = {category: i for i, category in enumerate(_PROCESS_CATEGORIES)}
+    # Transportation is excluded from total impact scores
+    _TOTAL_SCORES = operator.itemgetter(*(i for i, category in enumerate(_PROCESS_CATEGORIES) if category != 'Transportation'))
+    
     def __init__(self, name):
         self.name = name
-        self.water_use = self.create_impact_dict()
-        self.energy_resources = self.create_impact_dict()
-        self.acidification = self.create_impact_dict()
-        self.climate_change = self.create_impact_dict()
-        self.ecotoxicity_freshwater = self.create_impact_dict()
-        self.eutrophication = self.create_impact_dict()
-        self.human_toxicity_carcinogenic = self.create_impact_dict()
-        self.human_toxicity_noncarcinogenic = self.create_impact_dict()
-        self.ozone_depletion = self.create_impact_dict()
-        self.particulate_matter_formation = self.create_impact_dict()
-        self.photochemical_oxidant_formation = self.create_impact_dict()
+        self.scores = np.zeros((len(self._IMPACT_CATEGORIES), len(self._PROCESS_CATEGORIES)))
+        self.units = np.full(self.scores.shape, '', dtype=object)
+        
+    def __getattr__(self, name):
+        '''
+        Returns a copy of an impact category in the previous {process category: {'score', 'unit'}} layout, 
+        e.g. htc_lcia.water_use. Changes to the returned dictionary are not written back. 
+        '''
+        impact_idx = type(self)._IMPACT_IDX.get(name)
+        if impact_idx is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        return {
+            category: {'score': float(score), 'unit': unit}
+            for category, score, unit in zip(self._PROCESS_CATEGORIES, self.scores[impact_idx], self.units[impact_idx])
+        }
         
     def create_impact_dict(self):
         '''Creates impact dictioniary with process categories.'''
-        categories = ['Water', 'Electricity - HTC', 'Heat-HTC', 'CO2 - HTC', 'Wastewater', 'Electricity - Post-Processing', 'Transportation']
-        return {category: {'score': 0.0, 'unit': ''} for category in categories}
+        return {category: {'score': 0.0, 'unit': ''} for category in self._PROCESS_CATEGORIES}
 
     def set_impact_score(self, impact_category, process_category, score, unit):
         '''
@@ -33,77 +57,121 @@ class HTCLCIA:
             score: float
             unit: float
         '''
-        if hasattr(self, impact_category):
-            impact_data = getattr(self, impact_category)
-            if process_category in impact_data:
-                impact_data[process_category]['score'] = score
-                impact_data[process_category]['unit'] = unit
-            else:
-                impact_data[process_category] = {'score': score, 'unit': unit}
-        else:
-            raise ValueError(f"Impact category '{impact_category}' does not exist.")
+        try:
+            impact_idx = self._IMPACT_IDX[impact_category]
+        except KeyError:
+            raise ValueError(f"Impact category '{impact_category}' does not exist.") from None
+        try:
+            process_idx = self._PROCESS_IDX[process_category]
+        except KeyError:
+            raise ValueError(f"Process category '{process_category}' does not exist.") from None
+        self.scores[impact_idx, process_idx] = score
+        self.units[impact_idx, process_idx] = unit
 
     def get_impact_score(self, impact_category, process_category):
         '''
         Gets an impact score given a LCIA category and process category. 
         '''
-        if hasattr(self, impact_category):
-            impact_data = getattr(self, impact_category).get(process_category, None)
-            if impact_data:
-                return impact_data['score']
-            else:
-                return None
-        else:
-            raise ValueError(f"Impact category '{impact_category}' does not exist.")
+        try:
+            impact_idx = self._IMPACT_IDX[impact_category]
+        except KeyError:
+            raise ValueError(f"Impact category '{impact_category}' does not exist.") from None
+        process_idx = self._PROCESS_IDX.get(process_category)
+        if process_idx is None:
+            return None
+        return float(self.scores[impact_idx, process_idx])
     
     def get_impact_unit(self, impact_category, process_category):
-        if hasattr(self, impact_category):
-            impact_data = getattr(self, impact_category).get(process_category, None)
-            if impact_data:
-                return impact_data['unit']
-            else:
-                return None
-        else:
-            raise ValueError(f"Impact category '{impact_category}' does not exist.")
+        try:
+            impact_idx = self._IMPACT_IDX[impact_category]
+        except KeyError:
+            raise ValueError(f"Impact category '{impact_category}' does not exist.") from None
+        process_idx = self._PROCESS_IDX.get(process_category)
+        if process_idx is None:
+            return None
+        return self.units[impact_idx, process_idx]
         
     def get_total_impact_score(self, impact_category):
         '''
         Gets a total impact score given a LCIA category. 
         '''
-        if hasattr(self, impact_category):
-            impact_dict = getattr(self, impact_category)
-            return sum(impact['score'] for category, impact in impact_dict.items() if category != 'Transportation')
-        else:
-            raise ValueError(f"Impact category '{impact_category}' does not exist.")
+        try:
+            impact_idx = self._IMPACT_IDX[impact_category]
+        except KeyError:
+            raise ValueError(f"Impact category '{impact_category}' does not exist.") from None
+        return math.fsum(self._TOTAL_SCORES(self.scores[impact_idx].tolist()))
     
     def get_impact_categories(self):
-        '''Returns a list of available impact categories.'''
-        return [attr for attr in self.__dict__ if attr != 'name']
+        '''Returns the available impact categories as a tuple shared by all HTC LCIAs.'''
+        return self._IMPACT_CATEGORIES
 
     def get_process_categories(self):
-        '''Returns a list of available process categories.'''
-        if self.__dict__:
-            first_impact_category = self.get_impact_categories()[0]
-            return list(getattr(self, first_impact_category).keys())
-        return []
+        '''Returns the available process categories as a tuple shared by all HTC LCIAs.'''
+        return self._PROCESS_CATEGORIES
 
 class HTCLCIAManager:
     '''
-    Stores all created HTC LCIA objects in a list.
+    Stores all created HTC LCIA objects in a list, indexed by name for lookups.
     '''
+    # The index is kept in a slot so that __dict__ only holds the htc_lcias list
+    __slots__ = ('_by_name', '__dict__')
+
     def __init__(self):
         self.htc_lcias = []
+        self._by_name = {}
 
     def add_lcia(self, hydrochar: HTCLCIA):
         '''Adds a feedstock to Hydrochar LCIA Manager'''
         self.htc_lcias.append(hydrochar)
+        # The first LCIA added under a given name is the one returned by lookups
+        self._by_name.setdefault(hydrochar.name, hydrochar)
 
     def delete_lcia(self, name):
-        self.htc_lcias = [htc_lcia for htc_lcia in self.htc_lcias if htc_lcia.name != name]
+        if self._by_name.pop(name, None) is not None:
+            self.htc_lcias = [htc_lcia for htc_lcia in self.htc_lcias if htc_lcia.name != name]
+
+    def delete_lcias(self, names):
+        '''Deletes every LCIA with one of the given names, rebuilding the list once rather than once per name.'''
+        names = {name for name in names if self._by_name.pop(name, None) is not None}
+        if names:
+            self.htc_lcias = [htc_lcia for htc_lcia in self.htc_lcias if htc_lcia.name not in names]
 
     def get_lcia(self, name):
-        for htc_lcia in self.htc_lcias:
-            if htc_lcia.name == name:
-                return htc_lcia
-        return None
+        return self._by_name.get(name)
+
+def export_htc_lcia_to_excel(htc_lcia_manager: HTCLCIAManager, exchange_names, input_names, file_path):
+    '''
+    Writes the LCIA results in a HTC LCIA Manager to an Excel file, with one sheet per hydrochar sorted by name. 
+    Parameters: 
+        htc_lcia_manager: HTCLCIAManager
+        exchange_names: list of exchange inputs, written above each process category 
+        input_names: list of process categories to export, in column order 
+        file_path: str
+    '''
+    # Imported here so that importing lcia does not pay for openpyxl
+    from openpyxl import Workbook
+    
+    # Write-only workbooks stream rows to disk instead of building every cell in memory
+    workbook = Workbook(write_only=True)
+    
+    # Rows 1 & 2 are the same on every sheet: two blank cells followed by exchange names, then by input names
+    exchange_row = [None, None, *[str(name) for name in exchange_names]]
+    input_row = [None, None, *input_names]
+    # Columns of the score arrays to export, in the order of input_names
+    columns = [HTCLCIA._PROCESS_IDX[process_category] for process_category in input_names]
+    
+    for hydrochar in sorted(htc_lcia_manager.htc_lcias, key=lambda x: x.name):
+        sheet = workbook.create_sheet(title=hydrochar.name.split('hydrochar production, ')[1])
+        sheet.append(exchange_row)
+        sheet.append(input_row)
+        
+        # Row 3: First cell filled with 'Impact Assessment Method'
+        sheet.append(['Impact Assessment Method'])
+        
+        # Fill other rows with impact assessment data, read straight from the score & unit arrays
+        for category, scores, units in zip(hydrochar.get_impact_categories(), hydrochar.scores, hydrochar.units):
+            method_name = category.replace('_', ' ').title()
+            method_unit = next((unit for unit in units if unit), "")
+            sheet.append([method_name, method_unit, *[float('{:.2e}'.format(score)) for score in scores[columns].tolist()]])
     
+    workbook.save(file_path)
@@ -1,6 +1,6 @@
 import numpy as np
-from scipy.optimize import fsolve
 import math
+import functools
 import pandas as pd
 import re
 from feedstock import Feedstock, FeedstockManager, create_elementary_feedstocks
@@ -14,29 +14,36 @@ def get_feedstock_quantity(yield_HC: float, feedstock: Feedstock):
 
 # Water Quantity 
 def get_water_quantity(yield_HC: float, feedstock: Feedstock): 
-    feedstock_quantity =  1 / (yield_HC * (1 - feedstock.moisture)) 
-    feedstock.quantity = feedstock_quantity
-    
-    ideal_mc = feedstock.moisture_content_target
-    if ideal_mc > feedstock.moisture:
-        water_needed =  (feedstock.quantity * (1 - ideal_mc)) / (1 - feedstock.moisture)
-        feedstock.water_added = water_needed
-        # feedstock.water_added = water_needed
-        feedstock.moisture = ideal_mc
-        return water_needed
-    else: 
-        # Returns default value of 0
-        return feedstock.water_added
-        # raise ValueError(
-        #     f"Feedstock with name '{feedstock.name}' has an ideal_mc of {feedstock.moisture_content_target} 
-        #         but a moisture of {feedstock.moisture}"
-        # )
+    # Reuses the quantity set by get_feedstock_quantity; it is only computed here if it has not been set yet
+    if not feedstock.quantity: 
+        get_feedstock_quantity(yield_HC, feedstock)
     
-    # water_quantity = feedstock.compute_water_added()
-    # return water_quantity
+    # Returns the default value of 0 if the feedstock is already wetter than its ideal moisture content
+    water_quantity = feedstock.compute_water_added()
+    return water_quantity
 
 
 # Heat Needed 
+# Parr 4520 reactor geometry & heat transfer constants, documented in get_T_o_solution & get_reaction_heat
+_R_S = 5.08e-2
+_R_O = 7.62e-2
+_R_I = 4.76e-2
+_K_1 = 0.058
+_K_S = 16.25
+_C = 1 / (_R_I * (np.log(_R_O / _R_S) / _K_1) * (np.log(_R_S / _R_I) / _K_S))
+_H = 20
+_EPSILON = 0.050
+_SIGMA = 5.67e-8
+_T_A = 20 + 273.15
+# Loop invariants of the outer temperature balance & heat flux
+_EPS_SIGMA = _EPSILON * _SIGMA
+_T_A4 = _T_A**4
+_C_PLUS_H = _C + _H
+_TANK_HEIGHT = 0.6096
+# Surface Area of Cylinder
+_SA = 2*math.pi*_R_O*_TANK_HEIGHT + 2*math.pi*_R_O**2
+
+@functools.lru_cache(maxsize=256)
 def get_T_o_solution(reaction_temp: float) -> float :
     '''
     Returns To in Kelvin (K) based on eqn (6) in this paper: 
@@ -69,32 +76,25 @@ def get_T_o_solution(reaction_temp: float) -> float :
     T_A: float 
         ambient temperature or room temperature in Kelvin (K)
     '''
-    r_s = 5.08e-2
-    r_o = 7.62e-2 
-    r_i = 4.76e-2
-    k_1 = 0.058 
-    k_s = 16.25
-    
-    # Define constants
-    C = 1 / (r_i * (np.log(r_o / r_s) / k_1) * (np.log(r_s / r_i) / k_s))
-       
-    h = 20  
-    epsilon = 0.050
-    sigma = 5.67e-8 
     T_R = reaction_temp + 273.15
-    T_A = 20 + 273.15 
+    # Terms of the equation that do not depend on T_O
+    constant = _C * T_R + _H * _T_A - _EPS_SIGMA * _T_A4
 
     # Initial guess for T_O
-    T_O_initial_guess = (T_R + T_A) / 2
+    T_O = (T_R + _T_A) / 2
     
-    # Define the function to solve
-    def equation(T_O):
-        return C * T_R - T_O * (C + h) + h * T_A + epsilon * sigma * (T_O**4 - T_A**4)
-
-    # Solve for T_O
-    get_T_o_solution = fsolve(equation, T_O_initial_guess)
-    return get_T_o_solution[0]
+    # Solve for T_O with Newton's method; the equation is smooth & monotonic around the root, 
+    # so this converges in a handful of iterations
+    for _ in range(50): 
+        equation = constant - T_O * _C_PLUS_H + _EPS_SIGMA * T_O**4
+        derivative = 4 * _EPS_SIGMA * T_O**3 - _C_PLUS_H
+        step = equation / derivative
+        T_O -= step
+        if abs(step) < 1e-10: 
+            break
+    return T_O
 
+@functools.lru_cache(maxsize=256)
 def get_heat_flux(reaction_temp: float) -> float:
     ''''
     Returns the heat flux in W per meters squared (W⋅m-2) based on eqn (5) in this paper: 
@@ -116,15 +116,11 @@ def get_heat_flux(reaction_temp: float) -> float:
     sigma: float 
         Stefan-Boltzmann constant in Watts per meter squared per Kelvin to the fourth (W⋅m-2⋅K-4)
     '''
-    
-    h = 20  
     T_O = get_T_o_solution(reaction_temp)
-    epsilon = 0.050
-    sigma = 5.67e-8 
-    T_A = 20 + 273.15 
     
-    return h * (T_O - T_A) + epsilon*sigma *(T_O**4 - T_A**4) 
+    return _H * (T_O - _T_A) + _EPS_SIGMA * (T_O**4 - _T_A4) 
 
+@functools.lru_cache(maxsize=256)
 def get_reaction_heat(reaction_temp: float, residence_time: float) -> float: 
     '''
     Returns the heat needed to maintain reaction temperature, based on heat losses in megajoules (MJ). 
@@ -143,17 +139,26 @@ def get_reaction_heat(reaction_temp: float, residence_time: float) -> float:
     h: float 
         Height of tank in meters (m)
     '''
-    r_o = 7.62e-2 
-    h = 0.6096 
-    
-    # Surface Area of Cylinder 
-    SA = 2*math.pi*r_o*h + 2*math.pi*r_o**2
     # SA * heat flux *residencce time = Watt hours
     # Multiplying by 0.001 for kWh; multiplying by 3.6 for MJ
-    reaction_heat = SA * get_heat_flux(reaction_temp) * residence_time * 0.001 * 3.6
+    reaction_heat = _SA * get_heat_flux(reaction_temp) * residence_time * 0.001 * 3.6
     return reaction_heat
 
-def ramping_heat(feedstock: Feedstock, reaction_temp: float) -> float:
+def _compute_mixture(feedstock: Feedstock) -> tuple: 
+    '''
+    Returns (total mass, water fraction, feedstock fraction, mixture density in kg⋅m-3) of the 
+    feedstock & added water in the reactor. Shared by the ramping heat & mixing electricity. 
+    '''
+    total_mass = feedstock.total_weight()
+    percent_water = feedstock.water_added / total_mass
+    percent_feedstock = feedstock.quantity / total_mass
+    rho_mix = percent_feedstock * feedstock.density + percent_water * 1000
+    return total_mass, percent_water, percent_feedstock, rho_mix
+
+# Specific Heat Capacity of Water in MJ / kg °C
+_C_WATER = 4.184e-3
+
+def ramping_heat(feedstock: Feedstock, reaction_temp: float, mixture: tuple = None) -> float:
     '''
     Returns the heat needed to reach the reaction temperature in megajoules (MJ). 
     
@@ -167,19 +172,20 @@ def ramping_heat(feedstock: Feedstock, reaction_temp: float) -> float:
     C_biomass: float
         Specific Heat Capacity of Biomass in MJ / kg° C
         Follows eqn (3) from this paper: https://www.sciencedirect.com/science/article/pii/S0016236113006856
+    mixture: tuple 
+        Output of _compute_mixture for the feedstock, if already computed
     ''' 
-    total_mass = feedstock.total_weight()
-    percent_water = feedstock.water_added / total_mass
-    percent_feedstock = feedstock.quantity / total_mass
+    if mixture is None: 
+        mixture = _compute_mixture(feedstock)
+    _, percent_water, percent_feedstock, _ = mixture
     
-    C_water = 4.184e-3
     C_biomass = (
         1e-6 * (5.340 * (reaction_temp + 273.15) - 299) * (1 - feedstock.moisture_content_target) + 
-        C_water * feedstock.moisture_content_target
+        _C_WATER * feedstock.moisture_content_target
     )
         
     # Assuming ambient temperature, 20°C
-    water_heat = feedstock.water_added * C_water * (reaction_temp - 20) * percent_water
+    water_heat = feedstock.water_added * _C_WATER * (reaction_temp - 20) * percent_water
     feedstock_heat = feedstock.quantity * C_biomass * (reaction_temp - 20) * percent_feedstock
     
     ramping_heat = water_heat + feedstock_heat 
@@ -192,7 +198,7 @@ def get_heat_needed(feedstock: Feedstock, reaction_temp: float, residence_time:
 
 
 # Electricity Needed  
-def get_electricity_rate(feedstock: Feedstock) -> float: 
+def get_electricity_rate(feedstock: Feedstock, mixture: tuple = None) -> float: 
     '''
     Returns the electricity from mixing in kW based on eqn (7) in this paper & supplementary information in this paper: 
         https://pubs.rsc.org/en/content/articlelanding/2012/ee/c2ee22180b#cit31
@@ -205,6 +211,8 @@ def get_electricity_rate(feedstock: Feedstock) -> float:
     Parameters: 
     feedstock: Feedstock 
         Feedstock object. See feedstock.py for additional information. 
+    mixture: tuple 
+        Output of _compute_mixture for the feedstock, if already computed
         
     Other Variables & Constants: 
     N: float 
@@ -221,11 +229,10 @@ def get_electricity_rate(feedstock: Feedstock) -> float:
 
     N = 6.67
     D = 0.057912 
-    total_mass = feedstock.total_weight()
-    percent_water = feedstock.water_added / total_mass
-    percent_feedstock = feedstock.quantity / total_mass
-    feedstock.density = percent_feedstock * feedstock.density + percent_water * 1000
-    rho = feedstock.density 
+    if mixture is None: 
+        mixture = _compute_mixture(feedstock)
+    # The mixture density is kept local so that repeated calls do not compound into feedstock.density
+    rho = mixture[3]
     mu = 1.002e-3
     
     R_e = N * D**2 * (rho / mu) 
@@ -250,8 +257,9 @@ def get_electricity_needed(feedstock: Feedstock, residence_time: float, reaction
     '''
     Returns total electricity needed in kWh
     '''
-    electricity_rate = get_electricity_rate(feedstock)
-    time = get_ramping_time(ramping_heat(feedstock, reaction_temp), heating_rate) + residence_time
+    mixture = _compute_mixture(feedstock)
+    electricity_rate = get_electricity_rate(feedstock, mixture)
+    time = get_ramping_time(ramping_heat(feedstock, reaction_temp, mixture), heating_rate) + residence_time
     return electricity_rate * time
 
 
@@ -295,6 +303,35 @@ def split_reactor_conditions(reaction_conditions):
         feedstock, temp, time = reaction_conditions.split('_')
     return feedstock, temp, time 
 
+# Sheets of the HTC workbook for each parameter, with a row per feedstock & residence time and a column per temperature
+_PARAMETER_SHEETS = {'gas_yield': 'Yield_Gas', 'HC_yield': 'Yield_HC', 'HHV_HC': 'HHV_HC'}
+
+@functools.lru_cache(maxsize=None)
+def _load_parameter_sheets() -> dict: 
+    '''Returns {sheet name: DataFrame} for all parameter sheets, read together in a single pass over the HTC workbook.'''
+    return pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name=list(_PARAMETER_SHEETS.values()), engine='calamine')
+
+@functools.lru_cache(maxsize=None)
+def _get_parameter_values(parameter: str) -> dict: 
+    '''
+    Returns the values of a parameter as {feedstock: {(time, temp): value}}. If a feedstock has more than one 
+    row for a residence time, the first row is used. 
+    '''
+    df = _load_parameter_sheets()[_PARAMETER_SHEETS[parameter]]
+    feedstocks = df.iloc[:, 0].astype(str).tolist()
+    hours = df['hours'].tolist()
+    temps = [column for column in df.columns[1:] if column != 'hours']
+    
+    parameter_values = {}
+    for temp in temps: 
+        for feedstock, time, value in zip(feedstocks, hours, df[temp].tolist()):
+            parameter_values.setdefault(feedstock, {}).setdefault((int(time), int(temp)), value)
+    return parameter_values
+
+# Reaction conditions of a hydrochar activity name, e.g. 'hydrochar production, rawDCW50_rawBSG50_sa_lb_190C_1hr'. 
+# The monte carlo (_mc) & sensitivity analysis (_sa_lb, _sa_ub) suffixes are not part of the feedstock name 
+_CONDITIONS_RE = re.compile(r'hydrochar production, (?P<feedstock>.+?)(?:_mc|_sa_lb|_sa_ub)?_(?P<temp>\d+)C_(?P<time>\d+)hr$')
+
 # Converting Name into relevant parameters
 def get_parameter(reaction_conditions: str, parameter: str) -> float: 
     '''
@@ -307,36 +344,19 @@ def get_parameter(reaction_conditions: str, parameter: str) -> float:
         Parameter of interest (gas yield, HC yield, HHV_HC)
 
     '''
-    reaction_conditions = reaction_conditions.split('hydrochar production, ')[1]
-      
-    if '_mc' in reaction_conditions:
-        reaction_conditions = reaction_conditions.replace('_mc', '', 1)
-        feedstock, temp, time = split_reactor_conditions(reaction_conditions)
-    elif '_sa_lb' in reaction_conditions: 
-        reaction_conditions = reaction_conditions.replace('_sa_lb', '', 1)
-        feedstock, temp, time = split_reactor_conditions(reaction_conditions)
-    elif '_sa_ub' in reaction_conditions: 
-        reaction_conditions = reaction_conditions.replace('_sa_ub', '', 1)
-        feedstock, temp, time = split_reactor_conditions(reaction_conditions)
-    else: 
-        feedstock, temp, time = split_reactor_conditions(reaction_conditions)
-    
-    temp = int(temp.split('C')[0])
-    time = int(time.split('hr')[0])
+    match = _CONDITIONS_RE.match(reaction_conditions)
+    if match is None: 
+        raise ValueError(f"Reaction conditions '{reaction_conditions}' are not valid.")
+    feedstock = match['feedstock']
+    temp = int(match['temp'])
+    time = int(match['time'])
     
-    if parameter == 'gas_yield': 
-        df = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='Yield_Gas', engine='openpyxl')
-    elif parameter == 'HC_yield': 
-        df = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='Yield_HC', engine='openpyxl')
-    elif parameter == 'HHV_HC': 
-        df = pd.read_excel('experimental-data/HTC_yield_HHV.xlsx',sheet_name='HHV_HC', engine='openpyxl')
-    else: 
+    if parameter not in _PARAMETER_SHEETS: 
         raise ValueError(f"Parameter '{parameter}' is not valid.")
-                
-    filtered_df = df[df.iloc[:, 0] == str(feedstock) ]
+    parameter_values = _get_parameter_values(parameter).get(str(feedstock))
     
     # If Loop for Handling Gas Yields for Composite Feedstocks
-    if len(filtered_df) < 1:
+    if parameter_values is None:
         parameter_value = 0 
         feedstocks = re.findall(r'([A-Za-z]+)(\d+)', feedstock)
         
@@ -352,7 +372,63 @@ def get_parameter(reaction_conditions: str, parameter: str) -> float:
             parameter_value += parameter_feedstock * percent 
 
         return parameter_value
-    return filtered_df[filtered_df['hours'] == int(time)][int(temp)].iloc[0]
+    return parameter_values[(time, temp)]
+
+def sweep_feedstocks(feedstock_manager: FeedstockManager, excluded_feedstocks=("rawSRU", "rawBSG"), heating_rate=1500) -> pd.DataFrame: 
+    '''
+    Returns a DataFrame with the HC yield, feedstock & water quantities, ramping heat (MJ) and heating rate 
+    (°C per minute) of every feedstock in a manager, computed column-wise rather than feedstock by feedstock. 
+    Unlike get_feedstock_quantity & get_water_quantity, the feedstocks themselves are not modified. 
+    
+    Parameters: 
+    feedstock_manager: FeedstockManager 
+        Feedstocks to sweep. See feedstock.py for additional information. 
+    excluded_feedstocks: iterable of str 
+        Feedstock names to leave out 
+    heating_rate: float 
+        Rate at which heat is supplied to reactor in Watts (W)
+    '''
+    excluded_feedstocks = set(excluded_feedstocks)
+    df = pd.DataFrame(
+        [(feedstock.name, int(feedstock.temp), int(feedstock.time), feedstock.moisture, feedstock.moisture_content_target, 
+          feedstock.density, feedstock.water_added)
+         for feedstock in feedstock_manager.feedstocks if feedstock.name not in excluded_feedstocks], 
+        columns=['name', 'temp', 'time', 'moisture', 'moisture_content_target', 'density', 'water_added']
+    )
+    
+    # Left-join the cached HC yields; composites missing from the workbook fall back to get_parameter
+    yields = pd.DataFrame(
+        [(feedstock, time, temp, value) 
+         for feedstock, values in _get_parameter_values('HC_yield').items() for (time, temp), value in values.items()], 
+        columns=['name', 'time', 'temp', 'yield_HC']
+    )
+    df = df.merge(yields, on=['name', 'temp', 'time'], how='left')
+    missing = df['yield_HC'].isna()
+    df.loc[missing, 'yield_HC'] = [
+        get_parameter(f"hydrochar production, {name}_{temp}C_{time}hr", 'HC_yield') 
+        for name, temp, time in df.loc[missing, ['name', 'temp', 'time']].itertuples(index=False)
+    ]
+    
+    moisture = df['moisture'].to_numpy(dtype=float)
+    target = df['moisture_content_target'].to_numpy(dtype=float)
+    temp = df['temp'].to_numpy(dtype=float)
+    
+    quantity = 1 / (df['yield_HC'].to_numpy(dtype=float) * (1 - moisture))
+    water_added = np.where(target > moisture, quantity * (1 - target) / (1 - moisture), df['water_added'].to_numpy(dtype=float))
+    
+    # Same as ramping_heat, per column 
+    total_mass = quantity + water_added
+    C_biomass = 1e-6 * (5.340 * (temp + 273.15) - 299) * (1 - target) + _C_WATER * target
+    ramp_heat = (
+        water_added * _C_WATER * (temp - 20) * (water_added / total_mass) + 
+        quantity * C_biomass * (temp - 20) * (quantity / total_mass)
+    )
+    
+    df['quantity'] = quantity
+    df['water_added'] = water_added
+    df['ramping_heat'] = ramp_heat
+    df['heating_rate'] = (temp - 20) / (60 * get_ramping_time(ramp_heat, heating_rate))
+    return df
 
 # feedstock_condition = 'hydrochar production, stdSRU_mc_220C_1hr'
 # print(get_parameter(feedstock_condition, 'HHV_HC'))  
@@ -381,3 +457,5 @@ def get_parameter(reaction_conditions: str, parameter: str) -> float:
 #             htrt = temp_diff/ramp_time
 #             print(f"{feedstock.name}_{feedstock.temp}C_{feedstock.time}hr heating rate:" , {htrt})
 #             print()
+
+# print(sweep_feedstocks(elementary_feedstocks))
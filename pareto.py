@@ -1,6 +1,63 @@
 import numpy as np
 import pandas as pd 
 
+def _dominated_by(points, others):
+    """
+    Flag the points that are dominated by at least one of the other points, with all objectives minimized. 
+    Objectives are compared one at a time, so only (points, others) boolean arrays are ever allocated.
+    """
+    no_worse = np.ones((len(points), len(others)), dtype=bool)
+    better = np.zeros((len(points), len(others)), dtype=bool)
+    for k in range(points.shape[1]):
+        # [i, j] compares other point j against point i
+        no_worse &= np.asarray(others[None, :, k] <= points[:, None, k], dtype=bool)
+        better |= np.asarray(others[None, :, k] < points[:, None, k], dtype=bool)
+    return (no_worse & better).any(axis=1)
+
+def _dominated(values, chunk_size=512):
+    """
+    Flag the points that are dominated by at least one other point, with all objectives minimized. 
+    A point is dominated if another point is no worse in every objective and better in at least one.
+    
+    Parameters:
+    ----------
+    values : numpy array
+        Array of objective values, one row per point.
+    chunk_size : int
+        Number of points compared at once, to bound the size of the (chunk, points) comparison arrays.
+    
+    Returns:
+    ----------
+    dominated : numpy array
+        Boolean array that is True for dominated points.
+    """
+    values = np.asarray(values)
+    dominated = np.zeros(len(values), dtype=bool)
+    # Non-numeric columns (e.g. labels) are compared element-wise as objects, as in a row-by-row comparison
+    if values.dtype == object:
+        try:
+            values = values.astype(np.float64)
+        except (TypeError, ValueError):
+            for start in range(0, len(values), chunk_size):
+                dominated[start:start + chunk_size] = _dominated_by(values[start:start + chunk_size], values)
+            return dominated
+    else:
+        values = np.ascontiguousarray(values, dtype=np.float64)
+    
+    # A point can only be dominated by points before it in lexicographic order, and any dominated dominator is itself 
+    # dominated by an earlier non-dominated point. So, in sorted order, each chunk only needs comparing against the 
+    # front found so far and itself, rather than against every point.
+    order = np.lexsort(values.T[::-1])
+    front = values[:0]
+    for start in range(0, len(values), chunk_size):
+        chunk = order[start:start + chunk_size]
+        points = values[chunk]
+        chunk_dominated = _dominated_by(points, np.concatenate([front, points]))
+        dominated[chunk] = chunk_dominated
+        front = np.concatenate([front, points[~chunk_dominated]])
+    
+    return dominated
+
 def get_pareto_front(data):
     """
     Compute the Pareto front from the given data. 
@@ -19,20 +76,7 @@ def get_pareto_front(data):
     # Extract objective values (skip first column if it contains metadata)
     values = data.iloc[:, 1:].values
     
-    # Initialize a boolean array to track whether each point is on the Pareto front
-    pareto_front = np.ones(len(values), dtype=bool)
-    
-    for i, point in enumerate(values):
-        # Only check points that are still on the Pareto front
-        if pareto_front[i]:
-            # Compare current point with all other points to check if it's dominated
-            for j, other_point in enumerate(values):
-                if i != j:  # Ensure the point is not compared with itself
-                    if np.all(other_point <= point) and np.any(other_point < point):
-                        pareto_front[i] = False
-                        break 
-    
-    return values[pareto_front]
+    return values[~_dominated(values)]
 
 def is_dominant(solution, others):
     """
@@ -43,9 +87,9 @@ def is_dominant(solution, others):
     others : list of lists or list of numpy arrays
         A list of other solutions to compare against.
     """
+    solution = np.asarray(solution)
     for other in others:
-        solution = np.array(solution)
-        other = np.array(other)
+        other = np.asarray(other)
         
         # Check if the solution is dominated by any other solution
         if np.all(solution >= other) and np.any(solution > other):
@@ -54,31 +98,20 @@ def is_dominant(solution, others):
 
 def pareto_sort(data):
     """
-    Perform Pareto sorting of solutions. Returns a list of dominant & non-dominant solutions. 
+    Perform Pareto sorting of solutions. Returns the dominant & non-dominant solutions. 
     ----------
     data : Pandas DataFrame
         DataFrame containing the solutions with their objective values.
-    """
-    dominant = []
-    non_dominant = []
-    
-    # Convert the DataFrame into a list of solutions (objective values)
-    data_points = data.iloc[:, 1:].values
     
-    for index, row in data.iterrows(): 
-        data_point = row[1:].values 
-        other_points = np.delete(data_points, index, axis=0) 
-        
-        # Check if the current solution is dominant
-        if is_dominant(data_point, other_points): 
-            dominant.append(row)
-        else: 
-            non_dominant.append(row)
-    
-    # print(dominant)
-    # print(non_dominant)
+    Returns:
+    ----------
+    dominant, non_dominant : Pandas DataFrame
+        Rows of data that are not dominated by any other solution, and the remaining rows.
+    """
+    # Objective values of all solutions (skip first column if it contains metadata)
+    dominated = _dominated(data.iloc[:, 1:].values)
     
-    return dominant, non_dominant
+    return data[~dominated], data[dominated]
 
 # Example Usage
 # data = {